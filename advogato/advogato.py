@@ -1,12 +1,19 @@
 #!/usr/bin/python3
 
 """ 
-This is the Advogato trust metric, based on max flow using Ford-Fulkerson and BFS.
+This is the Advogato trust metric, based on max flow using Ford-Fulkerson and BFS (or Dinic's 
+algorithm, which finds a blocking flow per BFS phase rather than a single augmenting path, or the
+push-relabel algorithm, which doesn't search for augmenting paths at all).
 """
 
 import sys
+from array import array
+from collections import deque
 from enum import IntEnum
-from functools import partial
+
+# We represent infinite capacity with an integer sentinel which is big enough to never be saturated,
+# such that capacities and flows are always integers (and fit in 32 bits)
+CAP_INF = 1 << 30
 
 # Discovery colors for graph search algos, we don't need em but they're nice for debugging
 class COLOR(IntEnum):
@@ -16,6 +23,8 @@ class COLOR(IntEnum):
 
 # A vertex property for graph search algos
 class Vertex_prop:
+  __slots__ = ("color", "d", "pi", "label")
+
   def __init__(self, color, d, pi, label):
     self.color = color
     self.d = d
@@ -63,48 +72,91 @@ class Digraph():
   Factory method to build a flow network based on the Advogato spec. 'vcaps' is a dictionary where 
   each key is a vertex label which maps to a capacity as an integer. 'source_label' is a string
   corresponding to a vertex which you should have already created. (It will get relabeled as part
-  of this process.) 'supersink_label' is a string; we'll create that vertex for you. If this 
-  Digraph has antiparallel edges, we will fix them up. Returns a 2-tuple: (Digraph, new source label)
+  of this process.) 'supersink_label' is a string; we'll create that vertex for you. Returns a 
+  2-tuple: (Flow_network, new source label)
   """
   def to_flow_net(self, vcaps, source_label, supersink_label):
-    ap_vertices = self._fix_antiparallel(vcaps)
-    g = Digraph()
+    g, index, t = self._new_flow_net(max(vcaps.values(), default=0), supersink_label)
 
-    for v in self.V:
-      in_vertex = Digraph.flow_net_get_vlabel_in(v)
-      out_vertex = Digraph.flow_net_get_vlabel_out(v)
+    for v in index:
       # If there's no entry for this vertex in the vertex capacities table, we must assume it's
       # unreachable from the source vertex, so assign it a capacity of 0
-      cap = vcaps[v] - 1 if v in vcaps else 0
-      g.add_edge(in_vertex, Edge(v=out_vertex, c=cap, vertex_id=v))
-      
-      # Don't add a unit edge for the "virtual" nodes we created while fixing antiparallel edges
-      if v not in ap_vertices:
-        g.add_edge(in_vertex, Edge(supersink_label, 1))
-
-      for u in self.V[v]:
-        g.add_edge(out_vertex, Edge(Digraph.flow_net_get_vlabel_in(u), float("inf")))
+      self._link_flow_net_vertex(g, index, v, vcaps[v] - 1 if v in vcaps else 0, t)
     
     return (g, Digraph.flow_net_get_vlabel_in(source_label))
-  
-  # Fix antiparallel edges per CLRS p. 711; returns a set of labels corresponding to the added vertices
-  def _fix_antiparallel(self, vcaps):
-    new_vertices = set()
 
-    for v in self.V.copy():
+  """
+  Like to_flow_net, but rather than taking a capacity for each vertex, we compute each vertex's 
+  distance from 'source_label' and look up its capacity in 'caps_table', a dictionary which maps 
+  distances to capacities as integers, where distances not in the table get a capacity of 1. We 
+  build the flow network during a single breadth first search, wiring up each vertex as we dequeue 
+  it, so we needn't first build a dictionary of distances and a dictionary of capacities. Vertices 
+  unreachable from the source vertex get a capacity of 0. Returns a 2-tuple: (Flow_network, new 
+  source label)
+  """
+  def bfs_to_flow_net(self, source_label, supersink_label, caps_table):
+    # Distances not in the table get a capacity of 1, so the largest capacity is at least 1
+    g, index, t = self._new_flow_net(max(caps_table.values(), default=0) or 1, supersink_label)
+    d = {source_label: 0}
+    q = deque((source_label,))
+
+    while len(q) != 0:
+      v = q.popleft()
+      du = d[v] + 1
+      self._link_flow_net_vertex(g, index, v, caps_table.get(d[v], 1) - 1, t)
+
       for u in self.V[v]:
-        if v in self.V[u]:
-          prime = f"ANTIPARALLEL_{u}->{v}"
-          new_vertices.add(prime)
-          self.add_edge(u, Edge(prime))
-          self.add_edge(prime, Edge(v))
-          self.del_edge(u, v)
-          # The added vertex gets a capacity of infinity, since it's a "virtual" node, i.e. it 
-          # doesn't actually represent an entity in our graph, it's basically just a fancy edge
-          vcaps[prime] = float("inf")
-
-    return new_vertices
+        if u not in d:
+          d[u] = du
+          q.append(u)
+
+    for v in index:
+      if v not in d:
+        self._link_flow_net_vertex(g, index, v, 0, t)
+
+    return (g, Digraph.flow_net_get_vlabel_in(source_label))
+
+  """
+  Create a Flow_network for to_flow_net and bfs_to_flow_net, with no edges yet, where 'max_cap' is 
+  the largest vertex capacity. Returns a 3-tuple: (Flow_network, dictionary mapping each vertex 
+  label to its index in this Digraph, supersink vertex ID)
+
+  We create every in and out vertex up front, such that the in and out vertices for the vertex at 
+  index i in this Digraph get IDs 2i and 2i + 1, so the caller can wire up the edges by ID. This way
+  we needn't construct or look up a transformed label for every edge. Antiparallel edges need no
+  fixing up, since a Flow_network keeps every edge and its transpose apart by edge ID.
+  """
+  def _new_flow_net(self, max_cap, supersink_label):
+    # No flow can exceed the total finite capacity, so as long as that's under CAP_INF, an edge with
+    # capacity CAP_INF is as good as infinite
+    if len(self.V) * max_cap >= CAP_INF:
+      raise ValueError(f"Capacities are too large to represent infinity as {CAP_INF}")
+
+    g = Flow_network()
+    index = {}
+
+    for i, v in enumerate(self.V):
+      index[v] = i
+      g.add_vertex(Digraph.flow_net_get_vlabel_in(v))
+      g.add_vertex(Digraph.flow_net_get_vlabel_out(v))
+
+    return (g, index, g.add_vertex(supersink_label))
 
+  """
+  Wire up vertex 'v' in Flow_network 'g' as created by _new_flow_net, where 'index' and 't' are as 
+  returned by _new_flow_net: link its in vertex to its out vertex with capacity 'cap', link its in
+  vertex to the supersink with capacity 1, and link its out vertex to the in vertex of each of its
+  successors with infinite capacity.
+  """
+  def _link_flow_net_vertex(self, g, index, v, cap, t):
+    in_vertex = 2 * index[v]
+    out_vertex = in_vertex + 1
+    g.link(in_vertex, out_vertex, cap, vertex_id=v)
+    g.link(in_vertex, t, 1)
+
+    for u in self.V[v]:
+      g.link(out_vertex, 2 * index[u], CAP_INF)
+  
   """
   Breadth first search. Optional function 'skip' is called for each edge (u, v) during graph
   exploration; if it returns True, edge (u, v) will not be explored. Pass 's' as string corresponding
@@ -122,11 +174,10 @@ class Digraph():
       vprops[v] = Vertex_prop(COLOR.WHITE, float("inf"), None, v)
 
     sp = Vertex_prop(COLOR.GREY, 0, None, s)
-    q = []
-    q.append(sp)
+    q = deque((sp,))
 
     while len(q) != 0:
-      u = q.pop(0)
+      u = q.popleft()
 
       for key in self.V[u.label]:
         edge = self.V[u.label][key]
@@ -145,25 +196,26 @@ class Digraph():
       u.color = COLOR.BLACK
 
     vprops[sp.label] = sp
-    filtered = [vp for vp in vprops.values() if vp.pi != None or vp == sp]
-    return dict(zip([vprop.label for vprop in filtered], filtered))
+    return {label: vp for label, vp in vprops.items() if vp.pi != None or vp == sp}
 
   # Idempotently add vertex 'u'
   def add_vertex(self, u):
     if u not in self.V:
-      self.V[u] = dict()
+      self.V[sys.intern(u)] = dict()
 
   # Idempotently add an outedge from vertex u, represented by Edge object 'e'. Caller must be sure
-  # to create and configure the Edge object correctly!
+  # to create and configure the Edge object correctly! We intern vertex labels as they're added, so 
+  # that label comparisons during dictionary lookups can usually short circuit on identity
   def add_edge(self, u, e):
     if u not in self.V:
-      self.V[u] = dict()
-
-    self.V[u][e.v] = e
+      self.V[sys.intern(u)] = dict()
 
     if e.v not in self.V:
+      e.v = sys.intern(e.v)
       self.V[e.v] = dict()
 
+    self.V[u][e.v] = e
+
   def del_edge(self, u, v):
     del self.V[u][v]
 
@@ -190,79 +242,466 @@ class Edge():
     return f"{self.v} ({self.f}/{self.c})"
 
 """
-per CLRS p. 725, this function produces a graph data structure G' of input G, where G' has
-all the edges of G and all the transposed edges of G. This allows us to represent G and its
-residual network in a single data structure which we can update efficiently during the main loop
-of Ford-Fulkerson, as opposed to recomputing a new residual network data structure on each 
-iteration. Note that the residual network of G' consists of the edges (u, v) of G' such that
-the residual capacity of (u, v) > 0.
+Data structure for a flow network, where vertices and edges are identified by integers which index
+into flat arrays, as opposed to labels which key into nested dictionaries. Vertex labels are mapped
+to IDs once, as vertices are added: 'ids' maps labels to IDs and 'labels' maps IDs back to labels.
+Edges are stored as a linked list per vertex: 'head[u]' and 'last[u]' are the first and last 
+outedges of vertex u and 'next_edge[e]' is the next outedge sharing a tail with edge e, where -1 
+terminates the list. Edge e goes to vertex 'to[e]' with capacity 'cap[e]' and flow 'flow[e]'. For 
+edges which represent vertex capacities, 'vertex_id[e]' indexes into 'vertices', the list of 
+original vertex labels. Capacities and flows are integers, where CAP_INF means infinity; they live 
+in plain lists, since CPython reads from a list faster than from an array.
+
+Per CLRS p. 725, we represent the network and its residual network in a single data structure:
+each edge we add is paired with its transposed edge, which has a capacity of zero and carries the
+negation of the flow over the original edge. Edges you add get even IDs and their transposed edges
+get the following odd IDs, so the edge paired with edge e is always 'e ^ 1', and its tail is
+'to[e ^ 1]'. The residual capacity of any edge e is 'cap[e] - flow[e]'.
 """
-def _optimize(g):
-  g_prime = Digraph()
-  
-  for vertex_key in g.V:
-    for edge_key in g.V[vertex_key]:
-      edge = g.V[vertex_key][edge_key]
-      g_prime.add_edge(vertex_key, Edge(edge.v, edge.c))
-      g_prime.add_edge(edge.v, Edge(vertex_key, edge.f))
-  
-  return g_prime
-
-# Compute the residual capacity for edge ('u', 'v') in graph 'g'
-def res_cap(g, u, v):
-  if g.has_edge(u, v):
-    return g.V[u][v].c - g.V[u][v].f
-  elif g.has_edge(v, u):
-    return g.V[v][u].f
-  else:
-    return 0
-
-# Edge skip function for BFS: skip edges with a residual capacity of zero
-def _has_zero_res_cap(g, u, v):
-  return res_cap(g, u, v) == 0
-
-# Compute max flow over Flow_network 'g', source vertex label 's' and sink vertex label 't'
-def ford_fulkerson(g, s, t):
-  g_prime = _optimize(g)
-  pg = g_prime.bfs(s, partial(_has_zero_res_cap, g))
+class Flow_network():
+  __slots__ = ("ids", "labels", "vertices", "head", "last", "next_edge", "to", "vertex_id", "cap", 
+    "flow")
+
+  def __init__(self):
+    self.ids = {}
+    self.labels = []
+    self.vertices = []
+    self.head = array("q")
+    self.last = array("q")
+    self.next_edge = array("q")
+    self.to = array("q")
+    self.vertex_id = array("q")
+    self.cap = []
+    self.flow = []
+
+  def __str__(self):
+    return "\n".join([self.labels[u] + ": " + ", ".join([f"{self.labels[self.to[e]]} " + 
+      f"({self.flow[e]}/{self.cap[e]})" for e in self.edges(u) if e % 2 == 0]) 
+      for u in range(len(self.labels))])
+
+  # Idempotently add vertex 'u', returns its ID
+  def add_vertex(self, u):
+    if u not in self.ids:
+      u = sys.intern(u)
+      self.ids[u] = len(self.labels)
+      self.labels.append(u)
+      self.head.append(-1)
+      self.last.append(-1)
+    
+    return self.ids[u]
+
+  # Add an edge from vertex 'u' to vertex 'v' with capacity 'c', returns its ID. Pass the original 
+  # vertex label as 'vertex_id' if the edge represents that vertex's capacity. Not idempotent!
+  def add_edge(self, u, v, c, vertex_id=None):
+    return self.link(self.add_vertex(u), self.add_vertex(v), c, vertex_id)
+
+  # Like add_edge, but for vertices which already exist, identified by vertex IDs 'u' and 'v'
+  def link(self, u, v, c, vertex_id=None):
+    if vertex_id is None:
+      vid = -1
+    else:
+      vid = len(self.vertices)
+      self.vertices.append(vertex_id)
+    
+    e = len(self.to)
+    self._add_edge(u, v, c, vid)
+    self._add_edge(v, u, 0, -1)
+    return e
+
+  def _add_edge(self, u, v, c, vid):
+    e = len(self.to)
+
+    if self.head[u] == -1:
+      self.head[u] = e
+    else:
+      self.next_edge[self.last[u]] = e
+
+    self.last[u] = e
+    self.next_edge.append(-1)
+    self.to.append(v)
+    self.vertex_id.append(vid)
+    self.cap.append(c)
+    self.flow.append(0)
+
+  # Generate the IDs of the outedges of vertex ID 'u', including transposed edges
+  def edges(self, u):
+    e = self.head[u]
+
+    while e != -1:
+      yield e
+      e = self.next_edge[e]
+
+  """
+  Copy the flow from Flow_network 'g_prev' onto the edges of this flow network which connect the same
+  pair of vertex labels, e.g., to warm start a max flow computation after we've added vertices and
+  edges to the graph that 'g_prev' was built from. Edges which don't exist in 'g_prev' get zero
+  flow. Returns True if the copied flow is feasible in this flow network; if some edge of 'g_prev'
+  which carries flow is missing here or has less capacity than its flow, we leave this flow network's
+  flow untouched and return False. (Flow conservation comes for free, since we copy the flow on
+  every edge into and out of each vertex.)
+  """
+  def copy_flow(self, g_prev):
+    to, cap = self.to, self.cap
+    flow = [0] * len(to)
+
+    for u_prev, label in enumerate(g_prev.labels):
+      u = self.ids.get(label)
+      # Map each vertex ID reachable by one outedge from u to the ID of that edge
+      outedges = {} if u is None else {to[e]: e for e in self.edges(u) if e % 2 == 0}
+
+      for e_prev in g_prev.edges(u_prev):
+        f = g_prev.flow[e_prev]
+
+        if e_prev % 2 == 1 or f == 0:
+          continue
+
+        e = outedges.get(self.ids.get(g_prev.labels[g_prev.to[e_prev]]))
+
+        if e is None or f > cap[e]:
+          return False
+
+        flow[e] = f
+        flow[e ^ 1] = -f
+
+    self.flow[:] = flow
+    return True
+
+  """
+  Breadth first search over the residual network from vertex ID 's', i.e., we do not explore edges 
+  with a residual capacity of zero. Returns a 2-tuple of lists indexed by vertex ID: (distance from 
+  's', ID of the edge we discovered the vertex by), where -1 denotes unreachable vertices and, for 
+  the predecessor edge, the source vertex itself. Pass a vertex ID as 'target' to stop searching as 
+  soon as we reach it, e.g., when you only need a shortest path to 'target'; the levels of the 
+  vertices we didn't get to will be -1.
+  """
+  def bfs(self, s, target=None):
+    level = [-1] * len(self.labels)
+    pi = [-1] * len(self.labels)
+    head, next_edge, to, cap, flow = self.head, self.next_edge, self.to, self.cap, self.flow
+    level[s] = 0
+    # Each vertex is enqueued at most once, so a list of |V| slots with head and tail indices 
+    # serves as our queue without ever growing
+    q = [0] * len(level)
+    q[0] = s
+    qh, qt = 0, 1
+
+    while qh != qt:
+      u = q[qh]
+      qh += 1
+      e = head[u]
+
+      while e != -1:
+        v = to[e]
+        
+        if level[v] == -1 and cap[e] - flow[e] > 0:
+          level[v] = level[u] + 1
+          pi[v] = e
+
+          if v == target:
+            return (level, pi)
+
+          q[qt] = v
+          qt += 1
+
+        e = next_edge[e]
+
+    return (level, pi)
+
+# Compute the residual capacity for edge ID 'e' in flow network 'g'
+def res_cap(g, e):
+  return g.cap[e] - g.flow[e]
+
+# Push 'cfp' units of flow along 'path', a list of edge IDs in flow network 'g'
+def _augment(g, path, cfp):
+  for e in path:
+    g.flow[e] += cfp
+    g.flow[e ^ 1] -= cfp
+
+# Compute max flow over Flow_network 'g', source vertex label 's' and sink vertex label 't'. Pass
+# 'verbose' as True to print a progress dot per augmenting path
+def ford_fulkerson(g, s, t, verbose=False):
+  s, t = g.ids[s], g.ids[t]
+  to, cap, flow = g.to, g.cap, g.flow
+  level, pi = g.bfs(s, t)
   
-  sys.stdout.write("Augmenting path")
+  if verbose:
+    sys.stdout.write("Augmenting path")
   # Since we used BFS, the path from the source to the sink is the shortest path
-  while t in pg:
-    # Collect the path from s to t as a list of tuples of edge labels in reverse order
+  while level[t] != -1:
+    # Collect the path from s to t as a list of edge IDs in reverse order, walking the predecessor
+    # edges back from t, and compute cfp aka the residual capacity of the path as we go
     path = []
-    vprop = pg[t]
+    cfp = CAP_INF
+    v = t
+
+    while v != s:
+      e = pi[v]
+      path.append(e)
 
-    while vprop.pi != None:
-      path.append((pg[vprop.pi.label].label, vprop.label))
-      vprop = vprop.pi
+      if cap[e] - flow[e] < cfp:
+        cfp = cap[e] - flow[e]
+
+      v = to[e ^ 1]
     
-    sys.stdout.write(".")
-    sys.stdout.flush()
+    if verbose:
+      sys.stdout.write(".")
+      sys.stdout.flush()
     
-    # Compute cfp aka the residual capacity of the path
-    cfp = float("inf")
+    for e in path:
+      flow[e] += cfp
+      flow[e ^ 1] -= cfp
+
+    level, pi = g.bfs(s, t)
+  
+  if verbose:
+    print("Done!")
+
+"""
+Compute max flow over Flow_network 'g', source vertex label 's' and sink vertex label 't' using
+Dinic's algorithm. Each phase runs a single BFS over the residual network to assign a level to each
+vertex, then finds a blocking flow over the level graph -- i.e., the edges (u, v) where v is one
+level deeper than u -- by repeated DFS from the source. Each vertex keeps a cursor into its list
+of outedges; when an edge is saturated or leads to a dead end, the cursor moves past it, so each
+edge is considered a constant number of times per phase. There are at most |V| phases. Pass
+'verbose' as True to print a progress dot per phase.
+"""
+def dinic(g, s, t, verbose=False):
+  s, t = g.ids[s], g.ids[t]
+  level, pi = g.bfs(s)
+  
+  if verbose:
+    sys.stdout.write("Blocking flow")
+  
+  while level[t] != -1:
+    _blocking_flow(g.head, g.next_edge, g.to, g.cap, g.flow, level, s, t)
+
+    if verbose:
+      sys.stdout.write(".")
+      sys.stdout.flush()
     
-    for edge in path:
-      u, v = edge
-      new_cfp = res_cap(g_prime, u, v)
+    level, pi = g.bfs(s)
+
+  if verbose:
+    print("Done!")
+
+"""
+Find a blocking flow from vertex ID 's' to vertex ID 't' over the level graph given by 'level', 
+where the rest of the arguments are the correspondingly named arrays of a Flow_network. We take 
+the arrays themselves rather than the Flow_network so that the inner loop is just indexing into 
+local variables, with no attribute lookups or function calls.
+"""
+def _blocking_flow(head, next_edge, to, cap, flow, level, s, t):
+  cursor = array("q", head)
+  # The current path from s as a list of edge IDs, and the vertex at its tip
+  path = []
+  u = s
+
+  while True:
+    if u == t:
+      # Compute cfp aka the residual capacity of the path, and push it
+      cfp = min([cap[e] - flow[e] for e in path])
+
+      for e in path:
+        flow[e] += cfp
+        flow[e ^ 1] -= cfp
       
-      if new_cfp < cfp:
-        cfp = new_cfp
-     
-    for edge in path:
-      u, v = edge
+      # Retreat to the tail of the first edge we just saturated and continue searching from there
+      for i, e in enumerate(path):
+        if cap[e] - flow[e] == 0:
+          break
       
-      # For each case, we update the optimizing data structure G' and also the original graph G
-      if g.has_edge(u, v):
-        g_prime.V[u][v].f += cfp
-        g_prime.V[v][u].c = g_prime.V[u][v].f # Update the transposed edge
-        g.V[u][v].f += cfp
+      u = to[path[i] ^ 1]
+      del path[i:]
+      continue
+
+    e = cursor[u]
+    next_level = level[u] + 1
+    
+    while e != -1 and (level[to[e]] != next_level or cap[e] - flow[e] == 0):
+      e = next_edge[e]
+    
+    cursor[u] = e
+    
+    if e != -1:
+      path.append(e)
+      u = to[e]
+    elif u == s:
+      # We've found a blocking flow
+      return
+    else:
+      # Dead end: back up and advance our predecessor's cursor past the edge that led us here
+      u = to[path.pop() ^ 1]
+      cursor[u] = next_edge[cursor[u]]
+
+"""
+Compute max flow over Flow_network 'g', source vertex label 's' and sink vertex label 't' using the 
+highest label variant of the push-relabel algorithm. Rather than augmenting along paths, we flood
+the network with a preflow which saturates every outedge of the source -- so the source's outedges 
+must have finite capacity! -- and then repeatedly discharge the highest active vertex, i.e., the 
+highest vertex with excess flow, by pushing its excess to neighbors one level below it, relabeling 
+it when it has none. We work in two phases: first we push as much excess as we can to the sink, 
+then we return what's left over to the source, such that we're left with a flow and not just a 
+preflow. Pass 'verbose' as True to print a progress dot per global relabeling.
+"""
+def push_relabel(g, s, t, verbose=False):
+  s, t = g.ids[s], g.ids[t]
+  excess = [0] * len(g.labels)
+
+  if verbose:
+    sys.stdout.write("Global relabel")
+
+  for e in g.edges(s):
+    r = res_cap(g, e)
+
+    if r > 0:
+      _augment(g, [e], r)
+      excess[g.to[e]] += r
+      excess[s] -= r
+
+  _push_relabel_phase(g, excess, t, s, verbose)
+  _push_relabel_phase(g, excess, s, t, verbose)
+
+  if verbose:
+    print("Done!")
+
+"""
+One phase of push-relabel over Flow_network 'g' with excess flows 'excess', where we discharge 
+active vertices toward vertex ID 'target' until no active vertex can reach it. 'other' is the 
+source or sink vertex ID that isn't the target; it's never active and never gets a height under 
+|V|. Heights are a lower bound on the distance from each vertex to the target in the residual 
+network, and a vertex with height |V| or more cannot reach the target at all. Every |V| relabels, 
+we do a global relabeling, i.e., we recompute exact distances with a reverse BFS from the target. 
+After each relabel, if no vertex remains at the vertex's old height, there's a gap: no vertex 
+above the gap can reach the target, so we lift them all to height |V| at once.
+"""
+def _push_relabel_phase(g, excess, target, other, verbose):
+  n = len(g.labels)
+  head, next_edge, to, cap, flow = g.head, g.next_edge, g.to, g.cap, g.flow
+  height = [n] * n
+  # The number of vertices at each height under |V|, and the active vertices at each height
+  count = [0] * n
+  active = [[] for _ in range(n)]
+  cursor = array("q", head)
+  # The reverse BFS queue for global relabeling, allocated once and reused on each relabeling
+  q = [0] * n
+  max_height = -1
+  relabels = 0
+
+  def global_relabel():
+    nonlocal max_height
+
+    height[:] = [n] * n
+    count[:] = [0] * n
+    height[target] = 0
+    q[0] = target
+    qh, qt = 0, 1
+
+    while qh != qt:
+      v = q[qh]
+      qh += 1
+      count[height[v]] += 1
+      e = head[v]
+
+      while e != -1:
+        u = to[e]
+
+        # Edge e ^ 1 goes from u to v
+        if height[u] == n and u != other and cap[e ^ 1] - flow[e ^ 1] > 0:
+          height[u] = height[v] + 1
+          q[qt] = u
+          qt += 1
+
+        e = next_edge[e]
+
+    # Heights may have risen, so edges behind a vertex's cursor may be admissible again
+    cursor[:] = array("q", head)
+
+    for bucket in active:
+      bucket.clear()
+
+    max_height = -1
+
+    for u in range(n):
+      if excess[u] > 0 and height[u] < n and u != target and u != other:
+        active[height[u]].append(u)
+        max_height = max(max_height, height[u])
+
+    if verbose:
+      sys.stdout.write(".")
+      sys.stdout.flush()
+
+  global_relabel()
+
+  while max_height >= 0:
+    if len(active[max_height]) == 0:
+      max_height -= 1
+      continue
+
+    u = active[max_height].pop()
+    hu = height[u]
+
+    # Skip vertices the gap heuristic lifted out from under us
+    if hu != max_height:
+      continue
+
+    e = cursor[u]
+
+    # Discharge u: push its excess over admissible edges, advancing its cursor past the rest
+    while excess[u] > 0 and e != -1:
+      v = to[e]
+      r = cap[e] - flow[e]
+
+      if r > 0 and height[v] == hu - 1:
+        d = min(excess[u], r)
+        flow[e] += d
+        flow[e ^ 1] -= d
+
+        if excess[v] == 0 and v != target and v != other:
+          active[height[v]].append(v)
+
+        excess[u] -= d
+        excess[v] += d
+
+        if d == r:
+          e = next_edge[e]
       else:
-        g_prime.V[v][u].f -= cfp
-        g_prime.V[u][v].c = g_prime.V[v][u].f # Update the transposed edge
-        g.V[v][u].f -= cfp
+        e = next_edge[e]
 
-    pg = g_prime.bfs(s, partial(_has_zero_res_cap, g))
-  
-  print("Done!")
+    cursor[u] = e
+
+    if excess[u] == 0:
+      continue
+
+    # We ran out of admissible edges, so relabel u to one more than its lowest residual neighbor
+    new_height = n
+    e = head[u]
+
+    while e != -1:
+      if cap[e] - flow[e] > 0 and height[to[e]] + 1 < new_height:
+        new_height = height[to[e]] + 1
+
+      e = next_edge[e]
+
+    count[hu] -= 1
+    cursor[u] = head[u]
+
+    if count[hu] == 0:
+      # Gap heuristic: nobody above the gap can reach the target
+      for v in range(n):
+        if hu < height[v] < n:
+          count[height[v]] -= 1
+          height[v] = n
+
+      height[u] = n
+    else:
+      height[u] = new_height
+
+      if new_height < n:
+        count[new_height] += 1
+        active[new_height].append(u)
+        max_height = max(max_height, new_height)
+
+    relabels += 1
+
+    if relabels % n == 0:
+      global_relabel()
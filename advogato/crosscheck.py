@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+
+"""
+This tool cross-checks our max flow solvers against one another. Run like so:
+
+./crosscheck.py [number of networks] [random seed]
+
+We generate random flow networks with between 10 and 60 vertices, including edges with zero and
+infinite capacity, solve each of them with every solver, and check that every solver returns a
+feasible flow with the same value as Ford-Fulkerson, which is the simplest of them and serves as
+our reference. We exit with a nonzero status on the first mismatch, printing the offending network.
+"""
+
+import advogato
+import random
+import sys
+
+SOLVERS = [advogato.dinic, advogato.push_relabel]
+CAPACITIES = [0, 1, 2, 3, 5, 8, advogato.CAP_INF]
+
+"""
+Generate a random network as a 3-tuple: (number of vertices, list of edges as (u, v, capacity)
+tuples, where u and v are vertex indices, source index). The sink is always vertex n - 1. Push-relabel
+saturates the source's outedges, so they never get infinite capacity.
+"""
+def random_network(rng):
+  n = rng.randint(10, 60)
+  edges = []
+
+  for _ in range(rng.randint(0, 5 * n)):
+    u, v, c = rng.randrange(n), rng.randrange(n), rng.choice(CAPACITIES)
+
+    if u != v and not (u == 0 and c == advogato.CAP_INF):
+      edges.append((u, v, c))
+
+  return (n, edges, 0)
+
+# Build a Flow_network from a network generated by random_network, labeling vertices by index
+def build(n, edges):
+  g = advogato.Flow_network()
+
+  for u in range(n):
+    g.add_vertex(str(u))
+
+  for u, v, c in edges:
+    g.add_edge(str(u), str(v), c)
+
+  return g
+
+"""
+Check that the flow over Flow_network 'g' respects capacities, skew symmetry, and conservation at
+every vertex but source vertex ID 's' and sink vertex ID 't'. Returns the value of the flow, or
+None if it's not a feasible flow.
+"""
+def flow_value(g, s, t):
+  net = [0] * len(g.labels)
+
+  for e in range(0, len(g.to), 2):
+    if not 0 <= g.flow[e] <= g.cap[e] or g.flow[e ^ 1] != -g.flow[e]:
+      return None
+
+    net[g.to[e]] += g.flow[e]
+    net[g.to[e ^ 1]] -= g.flow[e]
+
+  if any(net[u] != 0 for u in range(len(net)) if u != s and u != t):
+    return None
+
+  return net[t]
+
+def main():
+  n_networks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+
+  for i in range(n_networks):
+    n, edges, s = random_network(rng)
+    g = build(n, edges)
+    advogato.ford_fulkerson(g, str(s), str(n - 1))
+    expected = flow_value(g, s, n - 1)
+
+    for solver in SOLVERS:
+      g = build(n, edges)
+      solver(g, str(s), str(n - 1))
+      actual = flow_value(g, s, n - 1)
+
+      if actual != expected:
+        print(f"Mismatch on network {i}: ford_fulkerson found {expected}, {solver.__name__} " +
+          f"found {actual} (None means infeasible)")
+        print(f"Vertices: {n}, edges: {edges}")
+        sys.exit(1)
+
+  print(f"All solvers agree on {n_networks} networks")
+
+if __name__ == "__main__":
+  main()
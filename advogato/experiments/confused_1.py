@@ -35,7 +35,9 @@ ADVERSARY = "Adversary"
 print_vertex_info(g, TARGET)
 print("")
 
-# Adversary tricks target into assigning trust
+# Adversary tricks target into assigning trust. Note that we recompute trust from scratch, rather 
+# than warm starting from 'g': max flow doesn't determine how much flow each peer receives, and a 
+# warm start would favor the peers who were receiving flow before the attack
 h.add_edge(TARGET, advogato.Edge(ADVERSARY))
 g = recompute_trust(h)
 
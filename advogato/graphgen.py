@@ -10,11 +10,13 @@ vertices at distance 1 from the seed get an 'A' name, vertices at distance 2 get
 
 import advogato
 import tb
+import functools
 import random
 import json
 import string
 import pickle
 import uuid
+from collections import deque
 
 OUTPUT_DIR = "graphs"
 
@@ -26,49 +28,71 @@ can have (corresponding to the max number of signatures issued by that peer).
 max_depth = 8
 max_children = 4
 
-# Here we create a dictionary where each key is a lowercase letter mapping to a list of first names...
-with open("first-names.json") as f:
-  first = json.load(f)
+if max_depth > len(string.ascii_lowercase):
+  raise ValueError(f"Things break if 'max_depth' exceeds {len(string.ascii_lowercase)}")
 
-names = dict(zip(list(string.ascii_lowercase), [[] for _ in range(len(string.ascii_lowercase))]))
+"""
+Load our pools of names from disk, returning a 2-tuple: (first names, middle names). The first names
+come as a list of 26 lists, such that names[0] is the list of first names starting with 'a', 
+names[1] is those starting with 'b'... so we can fetch names by distance from seed. By combining a 
+first name with a middle name, we expand the name space. We load the pools lazily, the first time 
+we generate a graph, and cache them for every graph we generate thereafter.
+"""
+@functools.lru_cache(maxsize=1)
+def _load_name_pools():
+  with open("first-names.json") as f:
+    first = json.load(f)
 
-for name in first:
-  names[name[0].lower()].append(name)
+  names = [[] for _ in range(len(string.ascii_lowercase))]
 
-# By combining a first name with a middle name, we expand the name space...
-with open("middle-names.json") as f:
-  middle = json.load(f)
+  for name in first:
+    names[ord(name[0].lower()) - ord("a")].append(name)
 
-# Map integers [0, 25] to lowercase letters such that we can fetch a letter by distance from seed
-alpha_index = dict(zip(range(len(string.ascii_lowercase)), list(string.ascii_lowercase)))
+  with open("middle-names.json") as f:
+    middle = json.load(f)
 
-if max_depth > len(string.ascii_lowercase):
-  raise ValueError(f"Things break if 'max_depth' exceeds {len(string.ascii_lowercase)}")
+  if max_children > len(middle):
+    raise ValueError(f"Things break if 'max_children' exceeds {len(middle)}")
+
+  return (names, middle)
 
 """
-Recursive function to generate a random graph. To generate a new graph, create a Digraph with 
-one seed vertex, then pass the Digraph as 'g' and the vertex label for the seed as 'v'
+Function to generate a random graph. To generate a new graph, create a Digraph with one seed vertex,
+then pass the Digraph as 'g' and the vertex label for the seed as 'v'. We grow the tree breadth 
+first from a queue of (vertex label, depth) tuples rather than recursing, so we pay for neither a 
+stack frame per vertex nor Python's recursion limit as 'max_depth' grows.
 """
 def add_children(g, v, depth=1):
-  # Base case: we've reached our maximum depth, we're done here
-  if depth == max_depth:
-    return
-
-  # Recursive case: add a random number of children [1, max_children]
-  n_children = random.randint(1, max_children)
-  
-  for _ in range(n_children):
-    first_name = random.choice(names[alpha_index[depth - 1]])
-    middle_name = random.choice(middle)
-    child_name = f"{first_name} {middle_name}"
+  names, middle = _load_name_pools()
+  choice = random.choice
+  q = deque(((v, depth),))
+
+  while len(q) != 0:
+    parent, depth = q.popleft()
+
+    # We've reached our maximum depth, this vertex gets no children
+    if depth == max_depth:
+      continue
+
+    # Add a random number of children [1, max_children]
+    n_children = random.randint(1, max_children)
+    first_names = names[depth - 1]
     
-    # Dumb unoptimized way to avoid name collisisons
-    while child_name in g.V:
-      middle_name = random.choice(middle)
+    # Siblings draw their middle names without replacement, so they never collide with each other
+    for middle_name in random.sample(middle, n_children):
+      first_name = choice(first_names)
       child_name = f"{first_name} {middle_name}"
+      
+      # A collision with a vertex elsewhere in the graph is rare, so rather than retry until we draw
+      # a free name, we just disambiguate with a counter
+      i = 2
+
+      while child_name in g.V:
+        child_name = f"{first_name} {middle_name} {i}"
+        i += 1
 
-    g.add_edge(v, advogato.Edge(child_name))
-    add_children(g, child_name, depth + 1)
+      g.add_edge(parent, advogato.Edge(child_name))
+      q.append((child_name, depth + 1))
 
 """
 
@@ -15,6 +15,7 @@ g           the current state of the flow network
 """
 
 import advogato
+import heapq
 import sys
 import pickle
 from os.path import exists
@@ -37,12 +38,27 @@ CAPS = {
   6: 1
 }
 
-# Transform Digraph 'h' into a flow network, recompute trust, and return the transformed graph 
-def recompute_trust(h):
-  pg = h.bfs("seed")
-  vcaps = dict(zip(pg.keys(), [CAPS[vprop.d] if vprop.d in CAPS else 1 for vprop in pg.values()]))
-  g, new_source_label = h.to_flow_net(vcaps, "seed", "supersink")
-  advogato.ford_fulkerson(g, new_source_label, "supersink")
+"""
+Transform Digraph 'h' into a flow network, recompute trust, and return the transformed graph. If
+you've only added edges to 'h' since you last computed trust, pass the flow network you got back
+then as 'g_prev' to warm start from its flow: adding edges can only shorten distances from the seed,
+and thus raise capacities, so the old flow is still feasible and the solver can build on it. If
+the old flow isn't feasible -- e.g., because you deleted edges -- we recompute from scratch. Pass any
+of advogato's max flow solvers as 'solver': advogato.ford_fulkerson (Edmonds-Karp), advogato.dinic,
+or advogato.push_relabel. They all yield the same total flow, but max flow doesn't determine how 
+much flow each peer receives, so they (and warm starts) can distribute it differently. The 
+observations in our experiments were made with Edmonds-Karp; Dinic's algorithm, our default, happens
+to find the same per-peer flows on them, whereas push-relabel doesn't.
+"""
+def recompute_trust(h, g_prev=None, solver=advogato.dinic):
+  g, new_source_label = h.bfs_to_flow_net("seed", "supersink", CAPS)
+
+  # If the old flow isn't feasible, copy_flow leaves 'g' with zero flow
+  if g_prev is not None:
+    g.copy_flow(g_prev)
+
+  solver(g, new_source_label, "supersink")
+
   return g
 
 """
@@ -50,46 +66,42 @@ Print the inedges and outedges (and corresponding flow) for flow network 'g' and
 (pre-transformed) vertex label 'u'
 """
 def print_vertex_info(g, u):
-  neg = advogato.Digraph.flow_net_get_vlabel_in(u)
-  inedges = []
-
-  for v in g.V:
-    if neg in g.V[v]:
-      inedges.append(f"{advogato.Digraph.flow_net_get_vlabel_orig(v)} ({g.V[v][neg].f})")    
-  
-  print(f"Vertex info for {u} ({g.V[neg][advogato.Digraph.flow_net_get_vlabel_out(u)].f})...")
+  get_orig = advogato.Digraph.flow_net_get_vlabel_orig
+  labels, to, flow = g.labels, g.to, g.flow
+  neg = g.ids[advogato.Digraph.flow_net_get_vlabel_in(u)]
+  pos = g.ids[advogato.Digraph.flow_net_get_vlabel_out(u)]
+
+  # The inedges to a vertex are the transposes of the odd numbered edges in its adjacency list
+  inedges = [f"{get_orig(labels[to[e]])} ({flow[e ^ 1]})" for e in g.edges(neg) if e % 2 == 1]
+  vertex_edge = next(e for e in g.edges(neg) if e % 2 == 0 and to[e] == pos)
+  print(f"Vertex info for {u} ({flow[vertex_edge]})...")
   inedges = ", ".join(inedges)
   print(f"Inedges: {inedges}")
   
-  pos = advogato.Digraph.flow_net_get_vlabel_out(u)
-  outedges = []
-  
-  for v in g.V[pos]:
-    outedges.append(f"{advogato.Digraph.flow_net_get_vlabel_orig(v)} ({g.V[pos][v].f})") 
-  
+  outedges = [f"{get_orig(labels[to[e]])} ({flow[e]})" for e in g.edges(pos) if e % 2 == 0]
   outedges = ", ".join(outedges)
   print(f"Outedges: {outedges}")
 
 def print_graph_info(g):
   print("\nGraph info:")
-  print(f"Vertices: {len(g.V)}")
+  print(f"Vertices: {len(g.labels)}")
 
 # Print the top simulated peers by trust score
 def print_top(g, n_show=20):
   """
-  Produce a list of (u, v, vertex_id, flow) 4-tuples, sorted by flow. Here's where we put that
-  'vertex_id' property to use (we filter on it to select only the edges corresponding to vertices).
+  Select the IDs of the 'n_show' edges with the most flow from among the edges corresponding to
+  vertices. Here's where we put that 'vertex_id' property to use (we filter on it to select only the
+  edges corresponding to vertices). heapq.nlargest does a partial sort, so we needn't sort them all.
+  It's stable, so peers with equal trust are listed in edge ID order, which is the order in which
+  bfs_to_flow_net wired them up: breadth first from the seed, then the unreachable peers.
   """
-  edges = [(vlabel, edge.v, edge.vertex_id, edge.f) 
-    for vlabel in g.V.keys() for edge in g.V[vlabel].values() if edge.vertex_id]
-  
-  edges.sort(reverse=True, key=lambda x: x[3])
+  vertex_edges = (e for e in range(0, len(g.to), 2) if g.vertex_id[e] != -1)
+  top = heapq.nlargest(n_show, vertex_edges, key=g.flow.__getitem__)
 
   print(f"\nTop {n_show} peers by trust:")
 
-  for i, edge in enumerate(edges[0:n_show]):
-    u, v, vertex_id, f = edge
-    print(f"{i + 1}. {vertex_id}, {f}")
+  for i, e in enumerate(top):
+    print(f"{i + 1}. {g.vertices[g.vertex_id[e]]}, {g.flow[e]}")
 
 def main():
   if len(sys.argv) < 3:
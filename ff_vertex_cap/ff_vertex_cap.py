@@ -4,80 +4,59 @@
 Here we modify vanilla Ford-Fulkerson to work over flow networks which implement vertex capacities.
 This is achieved without significant modification by simply converting a graph with vertex 
 capacities to one with edge capacities: https://cseweb.ucsd.edu/classes/sp16/cse202-a/hw3sol.pdf
+The same goes for Dinic's algorithm, which we also implement.
 """
 
-from enum import IntEnum
-
-# Discovery colors for graph search algos, we don't need em but they're nice for debugging
-class COLOR(IntEnum):
-  WHITE = 0
-  GREY = 1
-  BLACK = 2
-
-# A vertex property for graph search algos
-class Vertex_prop:
-  def __init__(self, color, d, pi, label):
-    self.color = color
-    self.d = d
-    self.pi = pi
-    self.label = label
-
-  def __str__(self):
-    return (f"Vertex_prop(color: {self.color}, d: {self.d}, pi: " + 
-      f"{None if self.pi == None else self.pi.label}, label: {self.label})")
+from collections import deque
 
 """
 Breadth first search with a twist: when traversing the graph, we do not explore edges with a 
-residual capacity of zero. This lets us operate over the optimizing data structure G' and consider 
-only the edges which represent the residual network of G. Pass 'g' as Flow_network, source 's' as string 
-corresponding to vertex label. Returns a predecessor subgraph as a dictionary of Vertex_prop objects
+residual capacity of zero. Since every edge of a Flow_network is cross-linked with its transposed 
+edge, this lets us consider only the edges which represent the residual network of G. Pass 'g' as 
+Flow_network, source 's' as vertex ID. Rather than allocating an object per vertex on every search, 
+we return a 2-tuple of lists with one entry per vertex ID: (each vertex's distance from 's', the ID
+of its predecessor), where -1 denotes unreachable vertices and, for the predecessor, the source 
+vertex itself.
 """
 def bfs(g, s):
-  vprops = {}
-
-  for v in g.V:
-    # Don't include props for the source vertex
-    if v == s:
-      vprops[s] = None
-      continue
-    
-    vprops[v] = Vertex_prop(COLOR.WHITE, float("inf"), None, v)
-
-  sp = Vertex_prop(COLOR.GREY, 0, None, s)
-  q = []
-  q.append(sp)
+  d = [-1] * len(g.V)
+  pi = [-1] * len(g.V)
+  d[s] = 0
+  q = deque((s,))
 
   while len(q) != 0:
-    u = q.pop(0)
+    u = q.popleft()
 
-    for key in g.V[u.label]:
-      edge = g.V[u.label][key]
-      
+    for v in g.V[u]:
       # Skip edges with a residual capacity of zero
-      if res_cap(g, u.label, key) == 0:
-        continue
+      if d[v] == -1 and res_cap(g, u, v) != 0:
+        d[v] = d[u] + 1
+        pi[v] = u
+        q.append(v)
 
-      vp = vprops[edge.v] if vprops[edge.v] != None else sp
-
-      if vp.color == COLOR.WHITE:
-        vp.color = COLOR.GREY
-        vp.d = u.d + 1
-        vp.pi = u
-        q.append(vp)
-
-    u.color = COLOR.BLACK
-
-  vprops[sp.label] = sp
-  filtered = [vp for vp in vprops.values() if vp.pi != None or vp == sp]
-  return dict(zip([vprop.label for vprop in filtered], filtered))
+  return (d, pi)
 
 # Data structure for a flow network with edge capacities
 class Flow_network():
+  """
+  We identify vertices by integer IDs, assigned in the order we add them, rather than by their
+  labels: 'V' is a list of adjacency dictionaries, such that V[u] maps the ID of each vertex adjacent
+  to vertex ID u to its Edge object. 'ids' maps vertex labels to IDs, and 'labels' maps IDs back.
+  """
+  __slots__ = ("V", "ids", "labels")
+
   def __init__(self):
-    self.V = {}
+    self.V = []
+    self.ids = {}
+    self.labels = []
 
+  """
+  We don't print the transposed edges. Antiparallel edges share a net flow, so the edge carrying it
+  backwards shows a flow of zero rather than a negative flow.
+  """
   def __str__(self):
-    return "\n".join([v + ": " +  ", ".join([str(self.V[v][key]) for key in self.V[v]]) for v in self.V])
+    return "\n".join([self.labels[u] + ": " +  ", ".join([f"{self.labels[e.v]} ({max(e.f, 0)}/" +
+      f"{e.c})" for e in adj.values() if not e.transposed]) for u, adj in enumerate(self.V)])
   
   """
   Factory method to build a flow network from a directed graph with vertex capacities. 'adj_list' is
@@ -107,133 +86,250 @@ class Flow_network():
     return g
   
   def _fix_antiparallel(adj_list, capacities):
+    # We keep a set of every edge, so we can check whether an edge's transpose exists in constant
+    # time rather than by scanning an adjacency list
+    edges = {(v, u) for v in adj_list for u in adj_list[v]}
+
     for v in adj_list.copy():
       for u in adj_list[v]:
-        if v in adj_list[u]:
+        if (u, v) in edges:
           prime = f"ANTIPARALLEL_{u}->{v}"
           adj_list[u].append(prime)
           adj_list[prime] = [v]
           adj_list[u].remove(v)
+          edges.remove((u, v))
+          edges.add((u, prime))
+          edges.add((prime, v))
           # The added vertex gets a capacity of infinity, since it's a "virtual" node, i.e. it
           # doesn't actually represent an entity in our graph, it's basically just a fancy edge
           capacities[prime] = float("inf")
 
-  # Idempotently add vertex 'u'
+  # Idempotently add vertex 'u' and return its ID
   def add_vertex(self, u):
-    if u not in self.V:
-      self.V[u] = dict()
-
-  # Idempotently add an edge from vertex 'u' to vertex 'v' with capacity 'c'
-  def add_edge(self, u, v, c):
-    if u not in self.V:
-      self.V[u] = dict()
+    if u not in self.ids:
+      self.ids[u] = len(self.labels)
+      self.labels.append(u)
+      self.V.append(dict())
 
-    self.V[u][v] = Edge(v, c)
+    return self.ids[u]
 
-    if v not in self.V:
-      self.V[v] = dict()
+  """
+  Idempotently add an edge from vertex 'u' to vertex 'v' with capacity 'c'. Per CLRS p. 725, we also
+  add its transposed edge from 'v' to 'u' with a capacity of zero, and cross-link the pair via their
+  'rev' properties, such that a single data structure represents both G and its residual network. 
+  If edge ('v', 'u') already exists, it doubles as the transposed edge, so antiparallel edges work;
+  the pair then carries their net flow.
+  """
+  def add_edge(self, u, v, c):
+    u = self.add_vertex(u)
+    v = self.add_vertex(v)
+
+    if v in self.V[u]:
+      self.V[u][v].c = c
+      self.V[u][v].transposed = False
+    elif u == v:
+      # A self-loop can never carry flow, so it's its own transpose
+      edge = Edge(v, c)
+      edge.rev = edge
+      self.V[u][v] = edge
+    else:
+      edge = Edge(v, c)
+      edge.rev = Edge(u, 0, rev=edge, transposed=True)
+      self.V[u][v] = edge
+      self.V[v][u] = edge.rev
   
+  # Transposed edges aren't edges of G, so we don't count them
   def has_edge(self, u, v):
-    if u in self.V and v in self.V[u]:
-      return True
+    if u in self.ids and v in self.ids and self.ids[v] in self.V[self.ids[u]]:
+      return not self.V[self.ids[u]][self.ids[v]].transposed
     else:
       return False
 
-# Data structure for a directed edge in a flow network to vertex 'v' with capacity 'c'
+# Data structure for a directed edge in a flow network to vertex ID 'v' with capacity 'c', where 
+# 'rev' is its transposed edge. 'transposed' is True if this edge exists only as the transpose of
+# 'rev', rather than as an edge of G
 class Edge():
-  def __init__(self, v, c, f=0):
+  __slots__ = ("v", "c", "f", "rev", "transposed")
+
+  def __init__(self, v, c, f=0, rev=None, transposed=False):
     self.v = v
     self.c = c
     self.f = f
+    self.rev = rev
+    self.transposed = transposed
 
   def __str__(self):
     return f"{self.v} ({self.f}/{self.c})"
 
-"""
-per CLRS p. 725, this function produces a graph data structure G' of input G, where G' has
-all the edges of G and all the transposed edges of G. This allows us to represent G and its
-residual network in a single data structure which we can update efficiently during the main loop
-of Ford-Fulkerson, as opposed to recomputing a new residual network data structure on each 
-iteration. Note that the residual network of G' consists of the edges (u, v) of G' such that
-the residual capacity of (u, v) > 0.
-"""
-def _optimize(g):
-  g_prime = Flow_network()
-  
-  for vertex_key in g.V:
-    for edge_key in g.V[vertex_key]:
-      edge = g.V[vertex_key][edge_key]
-      g_prime.add_edge(vertex_key, edge.v, edge.c)
-      g_prime.add_edge(edge.v, vertex_key, edge.f)
-  
-  return g_prime
-
-# Compute the residual capacity for edge ('u', 'v') in graph 'g'
+# Compute the residual capacity for edge ('u', 'v') in graph 'g', by vertex ID. A transposed edge 
+# carries the negative of its edge's flow, so its residual capacity is that edge's flow
 def res_cap(g, u, v):
-  if g.has_edge(u, v):
-    return g.V[u][v].c - g.V[u][v].f
-  elif g.has_edge(v, u):
-    return g.V[v][u].f
-  else:
-    return 0
+  edge = g.V[u].get(v)
+  return 0 if edge is None else edge.c - edge.f
   
 # Compute max flow over Flow_network 'g', source vertex label 's' and sink vertex label 't'
 def ford_fulkerson(g, s, t):
-  g_prime = _optimize(g)
-  pg = bfs(g_prime, s)
+  s, t = g.ids[s], g.ids[t]
+  d, pi = bfs(g, s)
 
-  while t in pg:
-    # Collect the path from s to t as a list of tuples of edge labels in reverse order
+  while d[t] != -1:
+    # Collect the path from s to t as a list of Edge objects in reverse order, walking the 
+    # predecessors back from t, and compute cfp aka the residual capacity of the path as we go
     path = []
-    vprop = pg[t]
-
-    while vprop.pi != None:
-      path.append((pg[vprop.pi.label].label, vprop.label))
-      vprop = vprop.pi
-    
-    # Compute cfp aka the residual capacity of the path
     cfp = float("inf")
-    
-    for edge in path:
-      u, v = edge
-      new_cfp = res_cap(g_prime, u, v)
-      
-      if new_cfp < cfp:
-        cfp = new_cfp
+    v = t
+
+    while v != s:
+      edge = g.V[pi[v]][v]
+      path.append(edge)
+
+      if edge.c - edge.f < cfp:
+        cfp = edge.c - edge.f
+
+      v = pi[v]
      
     for edge in path:
-      u, v = edge
-      
-      # For each case, we update the optimizing data structure G' and also the original graph G
-      if g.has_edge(u, v):
-        g_prime.V[u][v].f += cfp
-        g_prime.V[v][u].c = g_prime.V[u][v].f # Update the transposed edge
-        g.V[u][v].f += cfp
-      else:
-        g_prime.V[v][u].f -= cfp
-        g_prime.V[u][v].c = g_prime.V[v][u].f # Update the transposed edge
-        g.V[v][u].f -= cfp
-
-    pg = bfs(g_prime, s)
-
-h = {
-  "s": ["v1", "v2"],
-  "v1": ["v3", "v2"],
-  "v2": ["v1", "v4"],
-  "v3": ["v2", "t"],
-  "v4": ["v3", "t"],
-  "t": []
-}
-
-h_cap = {
-  "s": 800,
-  "v1": 200,
-  "v2": 200,
-  "v3": 100,
-  "v4": 100,
-  "t": float("inf")
-}
-
-g = Flow_network.from_vcap_graph(h, h_cap)
-ford_fulkerson(g, "s_IN", "t_OUT")
-print(g)
+      edge.f += cfp
+      edge.rev.f -= cfp # Update the transposed edge
+
+    d, pi = bfs(g, s)
+
+"""
+Dinic's inner loops are faster over a compressed sparse row (CSR) representation of G, i.e., a 
+handful of flat lists indexed by vertex and edge IDs. The outedges of vertex ID u have the edge IDs 
+indptr[u] through indptr[u + 1] - 1, and edge ID e goes to vertex ID head[e] with capacity cap[e] 
+and flow flow[e]. rev[e] is the ID of e's transposed edge. Pass 'g' as Flow_network. Returns a 
+6-tuple: (indptr, head, cap, flow, rev, edges), where edges[e] is the Edge object in 'g' which edge 
+ID e represents.
+"""
+def _to_csr(g):
+  indptr = [0]
+
+  for adj in g.V:
+    indptr.append(indptr[-1] + len(adj))
+
+  edges = [edge for adj in g.V for edge in adj.values()]
+  edge_to_id = {edge: e for e, edge in enumerate(edges)}
+  head = [edge.v for edge in edges]
+  cap = [edge.c for edge in edges]
+  flow = [edge.f for edge in edges]
+  rev = [edge_to_id[edge.rev] for edge in edges]
+  return (indptr, head, cap, flow, rev, edges)
+
+"""
+Breadth first search over the residual network of a CSR graph from vertex ID 's', i.e., we do not 
+explore edges with a residual capacity of zero. We write each vertex's level, i.e., its distance 
+from 's', to the list 'level', where -1 denotes unreachable vertices. 'q' is a list of |V| slots 
+which we use as our queue; since each vertex is enqueued at most once, it never overflows.
+"""
+def _csr_bfs_levels(indptr, head, cap, flow, s, level, q):
+  for v in range(len(level)):
+    level[v] = -1
+
+  level[s] = 0
+  q[0] = s
+  qh, qt = 0, 1
+
+  while qh != qt:
+    u = q[qh]
+    qh += 1
+
+    for e in range(indptr[u], indptr[u + 1]):
+      v = head[e]
+
+      if level[v] == -1 and cap[e] - flow[e] > 0:
+        level[v] = level[u] + 1
+        q[qt] = v
+        qt += 1
+
+"""
+Find a blocking flow over the level graph of a CSR graph -- i.e., the edges (u, v) with a residual 
+capacity greater than zero where v is one level deeper than u -- by repeated DFS from vertex ID 's'
+to vertex ID 't'. We build the current path iteratively as a list of edge IDs, so we needn't 
+recurse. Each vertex keeps a cursor into its range of outedges; when an edge is saturated or leads 
+to a dead end, the cursor moves past it, so each edge is considered a constant number of times per 
+phase. The tail of edge ID e is head[rev[e]].
+"""
+def _csr_blocking_flow(indptr, head, cap, flow, rev, level, s, t):
+  cursor = indptr[:len(level)]
+  path = []
+  u = s
+
+  while True:
+    if u == t:
+      # Compute cfp aka the residual capacity of the path, augment, and back up to the tail of the 
+      # first edge we saturated
+      cfp = min([cap[e] - flow[e] for e in path])
+
+      for e in path:
+        flow[e] += cfp
+        flow[rev[e]] -= cfp
+
+      i = next(i for i, e in enumerate(path) if cap[e] - flow[e] == 0)
+      u = head[rev[path[i]]]
+      del path[i:]
+      continue
+
+    # Advance u's cursor to its next edge in the level graph
+    e = cursor[u]
+    end = indptr[u + 1]
+
+    while e < end and (level[head[e]] != level[u] + 1 or cap[e] - flow[e] == 0):
+      e += 1
+    
+    cursor[u] = e
+    
+    if e < end:
+      path.append(e)
+      u = head[e]
+    elif u == s:
+      # We've found a blocking flow
+      return
+    else:
+      # Dead end: back up and advance our predecessor's cursor past the edge that led us here
+      u = head[rev[path.pop()]]
+      cursor[u] += 1
+
+"""
+Compute max flow over Flow_network 'g', source vertex label 's' and sink vertex label 't' using
+Dinic's algorithm: rather than running a BFS per augmenting path, each phase runs a single BFS to 
+assign a level to each vertex, then finds a blocking flow over the level graph. There are at most 
+|V| phases. We do the work over a CSR copy of 'g', then copy the resulting flow back to the edges 
+of 'g'
+"""
+def dinic(g, s, t):
+  indptr, head, cap, flow, rev, edges = _to_csr(g)
+  s, t = g.ids[s], g.ids[t]
+  level = [-1] * len(g.V)
+  q = [0] * len(g.V)
+  _csr_bfs_levels(indptr, head, cap, flow, s, level, q)
+
+  while level[t] != -1:
+    _csr_blocking_flow(indptr, head, cap, flow, rev, level, s, t)
+    _csr_bfs_levels(indptr, head, cap, flow, s, level, q)
+
+  for e, edge in enumerate(edges):
+    edge.f = flow[e]
+
+if __name__ == "__main__":
+  h = {
+    "s": ["v1", "v2"],
+    "v1": ["v3", "v2"],
+    "v2": ["v1", "v4"],
+    "v3": ["v2", "t"],
+    "v4": ["v3", "t"],
+    "t": []
+  }
+
+  h_cap = {
+    "s": 800,
+    "v1": 200,
+    "v2": 200,
+    "v3": 100,
+    "v4": 100,
+    "t": float("inf")
+  }
+
+  g = Flow_network.from_vcap_graph(h, h_cap)
+  ford_fulkerson(g, "s_IN", "t_OUT")
+  print(g)